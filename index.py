@@ -1,75 +1,455 @@
 #!/usr/bin/env python3
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import base64
+import contextlib
 import hashlib
+import hmac
+import http.client
+import json
+import logging
+import os
+import urllib.error
+import urllib.parse
 import urllib.request
 import sys
+import threading
+import time
+import typing
+
+try:
+    import orjson  # Optional, faster index serialization
+except ImportError:
+    orjson = None
+
+log = logging.getLogger("penv-index")
+
+# Export expression for each kind of field
+_EXPORT_TEMPLATES = {
+    "exportable": "self.{name}.export()",
+    "exportable_list": "[item.export() for item in self.{name}]",
+    "list": "list(self.{name})",
+    "scalar": "self.{name}",
+}
+
+def _is_exportable(hint) -> bool:
+    return isinstance(hint, type) and issubclass(hint, Exportable)
+
+def _field_kind(hint) -> str:
+    """Classify a field type hint into one of _EXPORT_TEMPLATES."""
+    if _is_exportable(hint):
+        return "exportable"
+    if typing.get_origin(hint) in (list, tuple):
+        item_hint = (typing.get_args(hint) or (None,))[0]
+        return "exportable_list" if _is_exportable(item_hint) else "list"
+    return "scalar"
+
+def _export_fields(cls) -> Tuple[Tuple[str, str], ...]:
+    """
+    Build the (name, kind) dispatch table of the exported fields of cls.
+    
+    Private fields and aliases are skipped.
+    """
+    # Merged over the MRO, base class fields first
+    hints = typing.get_type_hints(cls)
+    
+    return tuple(
+        (name, _field_kind(hint))
+        for name, hint in hints.items()
+        if not name.startswith("_") and name not in ("aliases",)
+    )
+
+def _compile_export(qualname: str, export_fields):
+    """
+    Generate a straight-line export function from a dispatch table.
+    
+    Field types are resolved once per class instead of on every export call.
+    The function is named after qualname so tracebacks point at the class.
+    """
+    items = "".join(
+        f"        {name!r}: {_EXPORT_TEMPLATES[kind].format(name=name)},\n"
+        for name, kind in export_fields
+    )
+    source = "def export(self):\n    return {\n" + items + "    }\n"
+    namespace = {}
+    exec(compile(source, f"<{qualname}>", "exec"), namespace)
+    export = namespace["export"]
+    export.__qualname__ = qualname
+    return export
 
 class Exportable:
-    def export(self):
-        data = {}
-        for k, v in vars(self).items():
-            if k.startswith("_") or k in ("aliases",):
-                continue
+    __slots__ = ()
 
-            if isinstance(v, Exportable):
-                data[k] = v.export()
-            elif isinstance(v, list):
-                data[k] = [item.export() if isinstance(item, Exportable) else item for item in v]
-            else:
-                data[k] = v
-        return data
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._export_fields = _export_fields(cls)
+        # Each call builds new dicts, so callers are free to modify the result
+        cls.export = _compile_export(f"{cls.__qualname__}.export", cls._export_fields)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Url(Exportable):
     arch: str
     url: str
     sha256: Optional[str] = None  # SHA256 checksum
 
-def calculate_sha256_from_url(url: str) -> str:
-    """Download and calculate SHA256 checksum for a URL."""
-    print(f"Calculating checksum for: {url}", file=sys.stderr)
-    sha256_hash = hashlib.sha256()
+def check_hash_backend():
+    """Warn if SHA256 is not backed by OpenSSL or the CPU lacks SHA extensions."""
+    _hashlib = getattr(hashlib, "_hashlib", None)
+    if _hashlib is None or hashlib.sha256 is not getattr(_hashlib, "openssl_sha256", None):
+        log.warning("hashlib is not using OpenSSL, checksums will be slow")
+    else:
+        log.info("hashlib SHA256 is backed by OpenSSL")
     
     try:
-        with urllib.request.urlopen(url) as response:
-            for chunk in iter(lambda: response.read(8192), b""):
-                sha256_hash.update(chunk)
+        with open("/proc/cpuinfo", 'r') as f:
+            flags = set(f.read().split())
+    except OSError:
+        return
+    
+    # x86 reports sha_ni, ARMv8 reports sha2
+    sha_flags = flags & {"sha_ni", "sha2"}
+    if sha_flags:
+        log.info(f"CPU SHA extensions: {', '.join(sorted(sha_flags))}")
+    else:
+        log.warning("CPU does not advertise SHA extensions")
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+class _TeeReader:
+    """Readable wrapper copying everything read through readinto() to a sink."""
+    def __init__(self, fileobj, sink):
+        self.fileobj = fileobj
+        self.sink = sink
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.fileobj.readinto(buffer)
+        if size:
+            self.sink.write(memoryview(buffer)[:size])
+        return size
+
+def sha256_from_fileobj(fileobj, sink=None):
+    """
+    Hash a binary file-like object, keeping the read loop out of Python where possible.
+    
+    If sink is given, the data is also written to it, so a single pass yields
+    both the file and its checksum.
+    """
+    if sink is not None:
+        fileobj = _TeeReader(fileobj, sink)
+    
+    if hasattr(hashlib, "file_digest"):  # Python 3.11+
+        return hashlib.file_digest(fileobj, "sha256")
+    
+    # Same loop as file_digest, reading into one reusable buffer
+    sha256_hash = hashlib.new("sha256")
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        size = fileobj.readinto(buffer)
+        if not size:
+            break
+        sha256_hash.update(view[:size])
+    return sha256_hash
+
+class _ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections shared between worker threads, per host.
+    
+    At most max_per_host requests run against a host at once, to avoid hammering mirrors.
+    """
+    def __init__(self, max_per_host: int = 6, timeout: float = 60, keepalive: float = 30):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.lock = threading.Lock()
+        self.idle = {}  # (scheme, netloc) -> [(connection, idle since)]
+        self.slots = {}  # netloc -> semaphore
+
+    def slot(self, netloc: str):
+        """Semaphore to hold while talking to netloc."""
+        with self.lock:
+            if netloc not in self.slots:
+                self.slots[netloc] = threading.BoundedSemaphore(self.max_per_host)
+            return self.slots[netloc]
+
+    def get(self, scheme: str, netloc: str, proxy=None):
+        """
+        Return a connection and whether it was reused from the pool.
+        
+        proxy is the (netloc, headers) of the proxy to go through, as returned by _proxy_for().
+        """
+        expired = []
+        conn = None
+        with self.lock:
+            conns = self.idle.get((scheme, netloc), [])
+            while conns:
+                candidate, since = conns.pop()
+                # Servers drop idle connections, don't bother reusing stale ones
+                if time.monotonic() - since < self.keepalive:
+                    conn = candidate
+                    break
+                expired.append(candidate)
+        
+        for candidate in expired:
+            candidate.close()
+        if conn is not None:
+            return conn, True
+        
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        if proxy is None:
+            return conn_cls(netloc, timeout=self.timeout), False
+        
+        proxy_netloc, proxy_headers = proxy
+        conn = conn_cls(proxy_netloc, timeout=self.timeout)
+        # HTTPS goes through a CONNECT tunnel, plain HTTP requests are sent to the proxy as is
+        if scheme == "https":
+            conn.set_tunnel(netloc, headers=proxy_headers)
+        return conn, False
+
+    def put(self, scheme: str, netloc: str, conn):
+        with self.lock:
+            conns = self.idle.setdefault((scheme, netloc), [])
+            if len(conns) < self.max_per_host:
+                conns.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+_pool = _ConnectionPool()
+
+MAX_REDIRECTS = 10
+
+def _proxy_for(scheme: str, netloc: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Return the (netloc, headers) of the proxy to reach netloc through, None to connect directly.
+    
+    Proxies are configured the same way as for urllib, through http_proxy, https_proxy and no_proxy.
+    """
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(netloc):
+        return None
+    
+    if "://" not in proxy:
+        proxy = f"http://{proxy}"
+    parsed = urllib.parse.urlsplit(proxy)
+    headers = {}
+    if parsed.username is not None:
+        credentials = f"{urllib.parse.unquote(parsed.username)}:{urllib.parse.unquote(parsed.password or '')}"
+        headers["Proxy-Authorization"] = f"Basic {base64.b64encode(credentials.encode()).decode()}"
+    return parsed.netloc.rpartition("@")[2], headers
+
+def _request(scheme: str, netloc: str, method: str, target: str):
+    """Send a request and return the connection and its response."""
+    headers = {"User-Agent": "penv-index"}
+    proxy = _proxy_for(scheme, netloc)
+    if proxy is not None and scheme != "https":
+        # Plain HTTP proxies take the full URL
+        target = f"{scheme}://{netloc}{target}"
+        headers.update(proxy[1])
+    
+    while True:
+        conn, reused = _pool.get(scheme, netloc, proxy)
+        try:
+            conn.request(method, target, headers=headers)
+            return conn, conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            # The server may have dropped an idle connection, retry on another one
+            if not reused:
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+@contextlib.contextmanager
+def open_url(url: str, method: str = "GET"):
+    """
+    Open a URL over a pooled keep-alive connection, following redirects.
+    
+    The connection goes back to the pool once the response has been read completely.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        parsed = urllib.parse.urlsplit(url)
+        target = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+        with _pool.slot(parsed.netloc):
+            conn, response = _request(parsed.scheme, parsed.netloc, method, target)
+            
+            if response.status in (301, 302, 303, 307, 308) or response.status >= 400:
+                response.read()
+                if response.will_close:
+                    conn.close()
+                else:
+                    _pool.put(parsed.scheme, parsed.netloc, conn)
+                
+                location = response.headers.get("Location")
+                if response.status >= 400 or not location:
+                    raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+                url = urllib.parse.urljoin(url, location)
+                continue
+            
+            if method == "HEAD":
+                response.read()
+            try:
+                yield response
+            except BaseException:
+                conn.close()
+                raise
+            
+            if response.isclosed() and not response.will_close:
+                _pool.put(parsed.scheme, parsed.netloc, conn)
+            else:
+                conn.close()
+            return
+    
+    raise urllib.error.URLError(f"too many redirects: {url}")
+
+# Cache fields telling whether a remote file changed, and the headers they come from
+VALIDATOR_HEADERS = {"etag": "ETag", "last_modified": "Last-Modified"}
+
+def _validators(headers) -> Dict[str, str]:
+    """Extract the validators present in response headers."""
+    return {key: headers[name] for key, name in VALIDATOR_HEADERS.items() if headers.get(name)}
+
+def remote_validators(url: str) -> Optional[Dict[str, str]]:
+    """Get the ETag and Last-Modified of a URL without downloading it, None if unavailable."""
+    try:
+        with open_url(url, "HEAD") as response:
+            return _validators(response.headers)
+    except Exception as e:
+        log.warning(f"HEAD {url}: {e}")
+        return None
+
+def cached_checksum(url: str, cache: Dict[str, Dict[str, str]]) -> Optional[str]:
+    """
+    Return the cached checksum of a URL if it is still valid.
+    
+    Entries with an ETag or Last-Modified are checked with a HEAD request,
+    entries without them are trusted as is. The checksum is only dropped when
+    the server returns different validators, not when it can't be reached.
+    """
+    cached = cache.get(url)
+    if not cached:
+        return None
+    
+    validators = {key: cached[key] for key in VALIDATOR_HEADERS if key in cached}
+    if validators:
+        remote = remote_validators(url)
+        if remote is None:
+            log.warning(f"{url}: could not check for changes, keeping cached checksum")
+        elif any(key in remote and remote[key] != value for key, value in validators.items()):
+            log.info(f"{url}: changed, cached checksum is stale")
+            return None
+    
+    log.info(f"{url}: reusing cached checksum")
+    return cached["sha256"]
+
+def calculate_sha256_from_url(url: str, sink=None, cache: Optional[Dict[str, Dict[str, str]]] = None) -> str:
+    """
+    Download and calculate SHA256 checksum for a URL, optionally saving the data to sink.
+    
+    If cache (url -> {sha256, etag, last_modified}) is given, a still valid
+    entry is returned without downloading, unless the data is wanted in sink.
+    Fresh checksums are stored in it. Returns "" on failure.
+    """
+    if cache is not None and sink is None:
+        checksum = cached_checksum(url, cache)
+        if checksum:
+            return checksum
+    
+    log.info(f"Calculating checksum for: {url}")
+    try:
+        with open_url(url) as response:
+            validators = _validators(response.headers)
+            sha256_hash = sha256_from_fileobj(response, sink)
         
         checksum = sha256_hash.hexdigest()
-        print(checksum)
+        log.info(f"{url}: {checksum}")
+        if cache is not None:
+            cache[url] = {"sha256": checksum, **validators}
         return checksum
     except Exception as e:
-        print()
-        print(f"Error: {e}", file=sys.stderr)
+        log.error(f"{url}: {e}")
         return ""
 
-@dataclass(frozen=True)
+def download_path(download_dir: str, url: str) -> str:
+    """Local path of a URL inside download_dir."""
+    parsed = urllib.parse.urlparse(url)
+    return os.path.join(download_dir, parsed.netloc, parsed.path.lstrip("/"))
+
+def download_with_sha256(url: str, download_dir: str, cache: Optional[Dict[str, Dict[str, str]]] = None) -> str:
+    """Download a URL into download_dir and return its SHA256 checksum."""
+    path = download_path(download_dir, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    # Download next to the final path, so an interrupted run never leaves a truncated file there
+    part = f"{path}.part"
+    try:
+        with open(part, 'wb') as sink:
+            checksum = calculate_sha256_from_url(url, sink, cache)
+        if checksum:
+            os.replace(part, path)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+    return checksum
+
+def sha256_digest_from_file(path: str) -> bytes:
+    """Calculate the raw SHA256 digest of a local file."""
+    with open(path, 'rb') as f:
+        return sha256_from_fileobj(f).digest()
+
+CHECKSUM_CACHE = ".checksum-cache.json"
+
+def load_checksum_cache(path: str) -> Dict[str, Dict[str, str]]:
+    """Load the url -> {sha256, etag, last_modified} cache, returning an empty cache if unavailable."""
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        log.warning(f"Could not load checksum cache: {e}")
+        return {}
+    
+    # Older caches stored the bare checksum
+    return {url: {"sha256": v} if isinstance(v, str) else v for url, v in cache.items()}
+
+def save_checksum_cache(path: str, cache: Dict[str, Dict[str, str]]):
+    """Atomically write the url -> {sha256, etag, last_modified} cache."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+@dataclass(frozen=True, slots=True)
 class Entry(Exportable):
     id: str
     name: str
     description: str
-    urls: List[Url]
-    aliases: list[str]
+    urls: Tuple[Url, ...]
+    aliases: Tuple[str, ...]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Distro(Entry):
     family: str
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Addon(Entry):
     distroIds: List[str] = field(default_factory=list)
     distroFamilies: List[str] = field(default_factory=list)
 
-entries: Dict[str, List[Entry]] = {
-    "distros": [],
-    "addons": []
-}
+# Filled by the add_*_distro() functions below, frozen once registration is done
+distros = []
+addons = []
+
+DEFAULT_ARCHS = ["amd64", "i386", "arm64", "armhf"]
 
-distros: List[Distro] = entries["distros"]
-addons: List[Addon] = entries["addons"]
+# Base URL of penv release assets
+RELEASE_URL = "https://github.com/Aeliux/penv/releases/download/{family}-{release}/"
 
 def handle_aliases(version, distro_base, is_latest, aliases):
     version_short = version.split('.')[0]  # "20.04" -> "20"
@@ -96,7 +476,7 @@ def add_penv_distro(
     version: str,      # e.g., "11", "12", "20.04"
     codename: str,     # e.g., "bullseye", "bookworm", "focal"
     release: str,      # e.g., "1.0"
-    archs: List[str] = ["amd64", "i386", "arm64", "armhf"],
+    archs: List[str] = DEFAULT_ARCHS,
     aliases: List[str] = None,
     is_latest: bool = False
 ):
@@ -117,23 +497,24 @@ def add_penv_distro(
     final_aliases = handle_aliases(version, distro_base, is_latest, aliases)
     
     # Generate URLs for each architecture
+    base_url = RELEASE_URL.format(family=family, release=release)
     urls = []
     for arch in archs:
         urls.append(
             Url(
-                arch=arch,
-                url=f"https://github.com/Aeliux/penv/releases/download/{family}-{release}/{distro_base}-{codename}-{arch}-rootfs.tar.gz"
+                arch=sys.intern(arch),
+                url=f"{base_url}{distro_base}-{codename}-{arch}-rootfs.tar.gz"
             )
         )
     
     distros.append(
         Distro(
             family=family,
-            id=distro_id,
+            id=sys.intern(distro_id),
             name=f"{distro_base.capitalize()} {version} {release}",
             description=f"{distro_base.capitalize()} {version} ({codename}) penv v{release} rootfs",
-            urls=urls,
-            aliases=final_aliases
+            urls=tuple(urls),
+            aliases=tuple(map(sys.intern, final_aliases))
         )
     )
 
@@ -143,7 +524,7 @@ def add_penv2_distro(
     distro_version: str,                    # e.g., "11", "12", "20.04"
     package_version: str,                   # e.g., "1.0"
     distro_codename: str | None = None,     # e.g., "bullseye", "bookworm", "focal"
-    archs: List[str] = ["amd64", "i386", "arm64", "armhf"],
+    archs: List[str] = DEFAULT_ARCHS,
     aliases: List[str] = None,
     is_latest: bool = False
 ):
@@ -170,164 +551,290 @@ def add_penv2_distro(
                                    aliases=aliases)
 
     # Generate URLs for each architecture
+    base_url = RELEASE_URL.format(family=family, release=package_version)
     urls = []
     for arch in archs:
         urls.append(
             Url(
-                arch=arch,
-                url=f"https://github.com/Aeliux/penv/releases/download/{family}-{package_version}/{distro}-{distro_codename}-{arch}-{package_version}-rootfs.tar.gz"
+                arch=sys.intern(arch),
+                url=f"{base_url}{distro}-{distro_codename}-{arch}-{package_version}-rootfs.tar.gz"
             )
         )
     
     distros.append(
         Distro(
             family=family,
-            id=distro_id,
+            id=sys.intern(distro_id),
             name=f"{distro.capitalize()} {distro_version} {package_version}",
             description=f"{distro.capitalize()} {distro_version} {f'({distro_codename})' if distro_codename else ''} penv v{package_version} rootfs",
-            urls=urls,
-            aliases=final_aliases
+            urls=tuple(urls),
+            aliases=tuple(map(sys.intern, final_aliases))
         )
     )
 
-# Vanilla distros (non-penv)
-distros.append(
-    Distro(
-        family="debian",
-        id="ubuntu-24.04-vanilla",
-        name="Ubuntu 24.04 vanilla",
-        description="Ubuntu 24.04 base rootfs",
-        urls=[
-            Url(
-                arch="amd64",
-                url="https://cdimage.ubuntu.com/ubuntu-base/releases/24.04/release/ubuntu-base-24.04.3-base-amd64.tar.gz"
-            )
-        ],
-        aliases=["ubuntu-24-vanilla", "ubuntu-vanilla"]
-    )
-)
-
-distros.append(
-    Distro(
-        family="alpine",
-        id="alpine-3.22-vanilla",
-        name="Alpine 3.22 vanilla",
-        description="Alpine linux 3.22 mini rootfs",
-        urls=[
-            Url(
-                arch="amd64",
-                url="https://dl-cdn.alpinelinux.org/alpine/v3.22/releases/x86_64/alpine-minirootfs-3.22.2-x86_64.tar.gz"
-            )
-        ],
-        aliases=["alpine-3-vanilla", "alpine-vanilla"]
+def add_vanilla_distro(
+    family: str,            # e.g., "debian", "alpine"
+    distro_id: str,         # e.g., "ubuntu-24.04-vanilla"
+    name: str,
+    description: str,
+    urls: Dict[str, str],   # arch -> url
+    aliases: List[str]
+):
+    """Add an upstream (non-penv) distro rootfs."""
+    distros.append(
+        Distro(
+            family=family,
+            id=sys.intern(distro_id),
+            name=name,
+            description=description,
+            urls=tuple(Url(arch=sys.intern(arch), url=url) for arch, url in urls.items()),
+            aliases=tuple(map(sys.intern, aliases))
+        )
     )
-)
-
-# Penv-built distros
-
-release = "1.1"
 
-# Debian versions
-add_penv_distro(family="debian", distro_base="debian", version="11", codename="bullseye", release=release)
-add_penv_distro(family="debian", distro_base="debian", version="12", codename="bookworm", release=release)
-add_penv_distro(family="debian", distro_base="debian", version="13", codename="trixie", release=release)
-
-# Ubuntu versions
-add_penv_distro(family="debian", distro_base="ubuntu", version="20.04", codename="focal", release=release, archs=["amd64", "i386"])
-add_penv_distro(family="debian", distro_base="ubuntu", version="22.04", codename="jammy", release=release, archs=["amd64", "i386"])
-add_penv_distro(family="debian", distro_base="ubuntu", version="24.04", codename="noble", release=release, archs=["amd64", "i386"])
+# Vanilla distros (non-penv)
+# (family, distro_id, name, description, {arch: url}, aliases)
+VANILLA_DISTROS = [
+    ("debian", "ubuntu-24.04-vanilla", "Ubuntu 24.04 vanilla", "Ubuntu 24.04 base rootfs",
+     {"amd64": "https://cdimage.ubuntu.com/ubuntu-base/releases/24.04/release/ubuntu-base-24.04.3-base-amd64.tar.gz"},
+     ["ubuntu-24-vanilla", "ubuntu-vanilla"]),
+    ("alpine", "alpine-3.22-vanilla", "Alpine 3.22 vanilla", "Alpine linux 3.22 mini rootfs",
+     {"amd64": "https://dl-cdn.alpinelinux.org/alpine/v3.22/releases/x86_64/alpine-minirootfs-3.22.2-x86_64.tar.gz"},
+     ["alpine-3-vanilla", "alpine-vanilla"]),
+]
 
-release = "1.2"
+for row in VANILLA_DISTROS:
+    add_vanilla_distro(*row)
 
-# Debian versions
-add_penv_distro(family="debian", distro_base="debian", version="11", codename="bullseye", release=release)
-add_penv_distro(family="debian", distro_base="debian", version="12", codename="bookworm", release=release)
-add_penv_distro(family="debian", distro_base="debian", version="13", codename="trixie", release=release, is_latest=True)
+# Penv-built distros
+# release -> [(family, distro_base, version, codename, archs, is_latest)]
+PENV_DISTROS = {
+    "1.1": [
+        ("debian", "debian", "11", "bullseye", DEFAULT_ARCHS, False),
+        ("debian", "debian", "12", "bookworm", DEFAULT_ARCHS, False),
+        ("debian", "debian", "13", "trixie", DEFAULT_ARCHS, False),
+        ("debian", "ubuntu", "20.04", "focal", ["amd64", "i386"], False),
+        ("debian", "ubuntu", "22.04", "jammy", ["amd64", "i386"], False),
+        ("debian", "ubuntu", "24.04", "noble", ["amd64", "i386"], False),
+    ],
+    "1.2": [
+        ("debian", "debian", "11", "bullseye", DEFAULT_ARCHS, False),
+        ("debian", "debian", "12", "bookworm", DEFAULT_ARCHS, False),
+        ("debian", "debian", "13", "trixie", DEFAULT_ARCHS, True),
+        ("debian", "ubuntu", "20.04", "focal", ["amd64", "i386"], False),
+        ("debian", "ubuntu", "22.04", "jammy", ["amd64", "i386"], False),
+        ("debian", "ubuntu", "24.04", "noble", ["amd64", "i386"], True),
+    ],
+}
 
-# Ubuntu versions
-add_penv_distro(family="debian", distro_base="ubuntu", version="20.04", codename="focal", release=release, archs=["amd64", "i386"])
-add_penv_distro(family="debian", distro_base="ubuntu", version="22.04", codename="jammy", release=release, archs=["amd64", "i386"])
-add_penv_distro(family="debian", distro_base="ubuntu", version="24.04", codename="noble", release=release, archs=["amd64", "i386"], is_latest=True)
+for release, rows in PENV_DISTROS.items():
+    for family, distro_base, version, codename, archs, is_latest in rows:
+        add_penv_distro(family=family, distro_base=distro_base, version=version, codename=codename,
+                        release=release, archs=archs, is_latest=is_latest)
 
-release = "2.1.1"
+# package_version -> [(family, distro, distro_version, distro_codename, archs, is_latest)]
+PENV2_DISTROS = {
+    "2.1.1": [
+        ("debian", "debian", "11", "bullseye", DEFAULT_ARCHS, False),
+        ("debian", "debian", "12", "bookworm", DEFAULT_ARCHS, False),
+        ("debian", "debian", "13", "trixie", DEFAULT_ARCHS, True),
+        ("debian", "ubuntu", "20.04", "focal", ["amd64", "arm64", "armhf"], False),
+        ("debian", "ubuntu", "22.04", "jammy", ["amd64", "arm64", "armhf"], False),
+        ("debian", "ubuntu", "24.04", "noble", ["amd64", "arm64", "armhf"], True),
+    ],
+}
 
-# Debian versions
-add_penv2_distro(family="debian", distro="debian", distro_version="11", distro_codename="bullseye", package_version=release)
-add_penv2_distro(family="debian", distro="debian", distro_version="12", distro_codename="bookworm", package_version=release)
-add_penv2_distro(family="debian", distro="debian", distro_version="13", distro_codename="trixie", package_version=release, is_latest=True)
+for package_version, rows in PENV2_DISTROS.items():
+    for family, distro, distro_version, distro_codename, archs, is_latest in rows:
+        add_penv2_distro(family=family, distro=distro, distro_version=distro_version, distro_codename=distro_codename,
+                         package_version=package_version, archs=archs, is_latest=is_latest)
 
-# Ubuntu versions
-archs = ["amd64", "arm64", "armhf"]
-add_penv2_distro(family="debian", distro="ubuntu", distro_version="20.04", distro_codename="focal", package_version=release, archs=archs)
-add_penv2_distro(family="debian", distro="ubuntu", distro_version="22.04", distro_codename="jammy", package_version=release, archs=archs)
-add_penv2_distro(family="debian", distro="ubuntu", distro_version="24.04", distro_codename="noble", package_version=release, archs=archs, is_latest=True)
+# Registration is done, freeze the registry
+distros: Tuple[Distro, ...] = tuple(distros)
+addons: Tuple[Addon, ...] = tuple(addons)
+entries: Dict[str, Tuple[Entry, ...]] = {"distros": distros, "addons": addons}
 
 if __name__ == "__main__":
-    import json
-    import os
+    import argparse
+    import filecmp
+    from concurrent.futures import ThreadPoolExecutor
+    
+    def positive_int(value):
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+        return number
+    
+    parser = argparse.ArgumentParser(description="Generate the penv index.json")
+    parser.add_argument("--refresh", action="store_true",
+                        help="ignore cached checksums and download every file again")
+    parser.add_argument("--download-dir", metavar="DIR",
+                        help="keep downloaded files in DIR instead of discarding them after hashing")
+    parser.add_argument("--verify", action="store_true",
+                        help="verify files already in the download directory against their checksums")
+    parser.add_argument("-j", "--jobs", type=positive_int, default=8, metavar="N",
+                        help=f"number of concurrent downloads, at most {_pool.max_per_host} per host "
+                             "(default: %(default)s)")
+    args = parser.parse_args()
+    
+    # Per-entry progress is only shown with PENV_LOG=INFO or DEBUG
+    log_level = (os.environ.get("PENV_LOG") or "WARNING").upper()
+    # getLevelName() maps known level names to their number
+    if not isinstance(logging.getLevelName(log_level), int):
+        print(f"Unknown PENV_LOG level {log_level!r}, using WARNING", file=sys.stderr)
+        log_level = "WARNING"
+    logging.basicConfig(level=log_level, format="%(levelname)s: %(message)s")
+    
+    if args.verify and not args.download_dir:
+        parser.error("--verify requires --download-dir")
     
     calculate_checksums = True
     
-    # Load existing index.json to reuse checksums
-    existing_index = {"distros": {}, "addons": {}}
-    if os.path.exists("index.json"):
-        print("Loading existing index.json to reuse checksums")
-        try:
-            with open("index.json", 'r') as f:
-                existing_index = json.load(f)
-        except Exception as e:
-            print(f"Warning: Could not load existing index.json: {e}", file=sys.stderr)
+    if calculate_checksums:
+        check_hash_backend()
     
+    # Checksums are cached by URL, so renamed entries don't trigger a redownload
+    checksum_cache = {}
+    if not args.refresh:
+        checksum_cache = load_checksum_cache(CHECKSUM_CACHE)
+        
+        # Seed the cache from existing index.json
+        if os.path.exists("index.json"):
+            print("Loading existing index.json to reuse checksums")
+            try:
+                with open("index.json", 'r') as f:
+                    existing_index = json.load(f)
+                for cat in entries:
+                    for existing_entry in existing_index.get(cat, {}).values():
+                        for existing_url in existing_entry.get('urls', []):
+                            if existing_url.get('sha256'):
+                                checksum_cache.setdefault(existing_url['url'], {"sha256": existing_url['sha256']})
+            except Exception as e:
+                log.warning(f"Could not load existing index.json: {e}")
+    
+    # Entries are stored under their id, aliases map to that id. Aliases are
+    # also kept as keys of their own for clients that predate the alias map.
     index = {
         "distros": {},
-        "addons": {}
+        "addons": {},
+        "aliases": {
+            "distros": {},
+            "addons": {}
+        }
     }
     
     print("Generating index")
     
-    for cat, target in index.items():
+    # url -> exported url dicts waiting for its checksum to be looked up or downloaded,
+    # shared URLs are only fetched once
+    pending = {}
+    
+    for cat, cat_entries in entries.items():
         print(f"Processing {cat}")
-        for entry in entries[cat]:
-            print(f"Exporting {entry.id} entry in {cat}")
-            data = entry.export()
+        exported = [(entry, entry.export()) for entry in cat_entries]
+        # Later entries (newer releases) take over shared aliases
+        index[cat] = {key: data for entry, data in exported for key in (entry.id, *entry.aliases)}
+        alias_map = index["aliases"][cat] = {
+            alias: entry.id for entry in cat_entries for alias in entry.aliases
+        }
+        
+        for entry, data in exported:
+            log.debug(f"Exported {entry.id} entry in {cat}")
             
             # Calculate checksums if requested
             if calculate_checksums:
-                print("Calculating checksum")
+                by_url = {url_data['url']: url_data for url_data in data['urls']}
                 for url_obj in entry.urls:
-                    print(f"{url_obj.arch}: {url_obj.url}")
+                    log.debug(f"{url_obj.arch}: {url_obj.url}")
                     if not url_obj.sha256:
-                        # Try to reuse existing checksum from index.json
-                        existing_checksum = None
-                        if entry.id in existing_index.get(cat, {}):
-                            existing_entry = existing_index[cat][entry.id]
-                            for existing_url in existing_entry.get('urls', []):
-                                if existing_url['url'] == url_obj.url and existing_url.get('sha256'):
-                                    existing_checksum = existing_url['sha256']
-                                    print(f"  Reusing existing checksum: {existing_checksum}")
-                                    break
-                        
-                        # Only download if we don't have an existing checksum
-                        if existing_checksum:
-                            checksum = existing_checksum
-                        else:
-                            print(f"  No existing checksum found, downloading...")
-                            checksum = calculate_sha256_from_url(url_obj.url)
-                        
-                        if checksum:
-                            for url_data in data['urls']:
-                                if url_data['url'] == url_obj.url:
-                                    url_data['sha256'] = checksum
-                                    break
+                        pending.setdefault(url_obj.url, []).append(by_url[url_obj.url])
             
-            for id in [entry.id] + entry.aliases:
-                print(f"Adding alias: {id}")
-                target[id] = data
+            for alias in entry.aliases:
+                if alias_map[alias] != entry.id:
+                    log.info(f"Alias {alias} of {entry.id} taken over by {alias_map[alias]}")
+    
+    # Files written by this run, their checksum is already known
+    downloaded = set()
+    
+    def fetch_checksum(url):
+        previous = checksum_cache.get(url, {}).get("sha256")
+        
+        if not args.download_dir:
+            checksum = calculate_sha256_from_url(url, cache=checksum_cache)
+        else:
+            # Files missing from the download directory are fetched even if their checksum is
+            # known, the ones already there are left to --verify
+            checksum = None
+            if os.path.exists(download_path(args.download_dir, url)):
+                checksum = cached_checksum(url, checksum_cache)
+            if not checksum:
+                downloaded.add(url)
+                checksum = download_with_sha256(url, args.download_dir, checksum_cache)
+        
+        # A failed download must not drop a checksum the index already had
+        if not checksum and previous:
+            log.warning(f"{url}: download failed, keeping previous checksum")
+            return previous
+        return checksum
+    
+    # Requests are I/O bound, so run them concurrently
+    if pending:
+        print(f"Checking {len(pending)} file(s) for checksums")
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            checksums = executor.map(fetch_checksum, pending)
+            for url_datas, checksum in zip(pending.values(), checksums):
+                if checksum:
+                    for url_data in url_datas:
+                        url_data['sha256'] = checksum
+        
+        save_checksum_cache(CHECKSUM_CACHE, checksum_cache)
+    
+    if args.verify:
+        expected = {}
+        for cat in entries:
+            for data in index[cat].values():
+                for url_data in data['urls']:
+                    path = download_path(args.download_dir, url_data['url'])
+                    if url_data['sha256'] and url_data['url'] not in downloaded and os.path.exists(path):
+                        expected[path] = bytes.fromhex(url_data['sha256'])
+        
+        # hashlib releases the GIL while hashing, so threads use every core
+        # without the cost of spawning processes
+        print(f"Verifying {len(expected)} downloaded file(s)")
+        mismatches = 0
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for (path, digest), actual in zip(expected.items(), executor.map(sha256_digest_from_file, expected)):
+                # Compare raw digests, hex is only for the index and messages
+                if not hmac.compare_digest(actual, digest):
+                    mismatches += 1
+                    log.error(f"Checksum mismatch: {path} (expected {digest.hex()}, got {actual.hex()})")
+        
+        if mismatches:
+            log.warning(f"{mismatches} downloaded file(s) failed verification")
     
     print("Writing index.json")
     
-    with open("index.json", 'w') as f:
-        js = json.dumps(index, indent=2)
-        f.write(js)
+    tmp = "index.json.tmp"
+    try:
+        if orjson is not None:
+            with open(tmp, 'wb') as f:
+                f.write(orjson.dumps(index, option=orjson.OPT_INDENT_2))
+        else:
+            with open(tmp, 'w') as f:
+                json.dump(index, f, indent=2)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    
+    # Leave index.json untouched when the content is the same
+    if os.path.exists("index.json") and filecmp.cmp(tmp, "index.json", shallow=False):
+        os.remove(tmp)
+        print("index.json is up to date")
+    else:
+        os.replace(tmp, "index.json")
+        print("Index generated successfully")
     
-    print("Index generated successfully")
\ No newline at end of file
+    # The index is still written, but failed verification has to fail the run
+    if args.verify and mismatches:
+        sys.exit(1)
@@ -85,9 +85,9 @@ index::get_distro(){
   local remote_index
   remote_index=$(index::fetch_remote) || return 1
   
-  # Get from remote index only
+  # Get from remote index only, resolving aliases to the canonical id
   local data
-  data=$(jq -r ".distros[\"$distro_id\"] // empty" "$remote_index" 2>/dev/null)
+  data=$(jq -r ".distros[.aliases.distros[\"$distro_id\"] // \"$distro_id\"] // empty" "$remote_index" 2>/dev/null)
   
   # Clean up temp file
   rm -f "$remote_index"
@@ -107,8 +107,9 @@ index::get_addon(){
   local remote_index
   remote_index=$(index::fetch_remote) || return 1
   
+  # Resolve aliases to the canonical id
   local data
-  data=$(jq -r ".addons[\"$addon_id\"] // empty" "$remote_index" 2>/dev/null)
+  data=$(jq -r ".addons[.aliases.addons[\"$addon_id\"] // \"$addon_id\"] // empty" "$remote_index" 2>/dev/null)
   
   # Clean up temp file
   rm -f "$remote_index"
@@ -164,7 +165,8 @@ index::list_distros(){
   
   header "Available Distributions"
   
-  jq -r '.distros | to_entries[] | "\(.key)|\(.value.name)|\(.value.description)"' "$remote_index" 2>/dev/null | sort | while IFS='|' read -r id name desc; do
+  # List canonical ids together with their aliases
+  jq -r '.distros as $d | (.distros + ((.aliases.distros // {}) | map_values($d[.]))) | to_entries[] | "\(.key)|\(.value.name)|\(.value.description)"' "$remote_index" 2>/dev/null | sort | while IFS='|' read -r id name desc; do
     printf "  ${C_GREEN}%-30s${C_RESET} ${C_DIM}%s${C_RESET}\n" "$id" "$desc"
   done
   
@@ -193,7 +195,7 @@ index::list_addons(){
     return
   fi
   
-  jq -r '.addons | to_entries[] | "\(.key)|\(.value.name)|\(.value.description)|\(.value.distroIds // [])|\(.value.distroFamilies // [])"' "$remote_index" 2>/dev/null | sort | while IFS='|' read -r id name desc distro_ids_json distro_families_json; do
+  jq -r '.addons as $a | (.addons + ((.aliases.addons // {}) | map_values($a[.]))) | to_entries[] | "\(.key)|\(.value.name)|\(.value.description)|\(.value.distroIds // [])|\(.value.distroFamilies // [])"' "$remote_index" 2>/dev/null | sort | while IFS='|' read -r id name desc distro_ids_json distro_families_json; do
     local distro_ids_count distro_families_count
     distro_ids_count=$(echo "$distro_ids_json" | jq 'length' 2>/dev/null)
     distro_families_count=$(echo "$distro_families_json" | jq 'length' 2>/dev/null)